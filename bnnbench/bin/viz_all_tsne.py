@@ -44,18 +44,48 @@ tasks = ['MNIST', 'Poker']
 # prefix = "4Tasks"
 # prefix = "2Tasks"
 
+
+def read_embeddings(dfpath: Path, raw_tasks=None) -> pd.DataFrame:
+    """ Reads the t-SNE embeddings DataFrame stored in the given directory. If pyarrow is available, a parquet copy of
+    the pickled DataFrame is generated once and all subsequent reads only load the row groups of the requested tasks.
+    """
+    pkl_file = dfpath / C.FileNames.tsne_embeddings_dataframe
+    parquet_file = dfpath / C.FileNames.tsne_embeddings_parquet
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        _log.debug("Could not import pyarrow, reading pickled DataFrame.")
+        return pd.read_pickle(pkl_file)
+
+    if not parquet_file.exists() or parquet_file.stat().st_mtime < pkl_file.stat().st_mtime:
+        _log.info("Generating parquet copy of %s" % str(pkl_file))
+        pd.read_pickle(pkl_file).to_parquet(parquet_file, engine="pyarrow")
+
+    # The index levels are stored as regular columns, so filters on "task" are pushed down to the parquet reader.
+    filters = None if raw_tasks is None else [("task", "in", list(raw_tasks))]
+    return pq.read_table(parquet_file, filters=filters).to_pandas()
+
+
 # labels = ['task', 'model', 'rng_offset', 'iteration']
 main_df = None
 for bench in benchmarks:
     print("Reading df from %s" % bench)
     prefix = f"{bench}_2Tasks"
     dfpath = source / bench
-    df: pd.DataFrame = pd.read_pickle(dfpath / C.FileNames.tsne_embeddings_dataframe)
+    raw_tasks = None
+    if tasks is not None:
+        # Tasks are selected by their display names, which may differ from the names stored on disk.
+        raw_tasks = set(tasks)
+        if task_name_maps is not None:
+            raw_tasks.update(k for k, v in task_name_maps.items() if v in tasks)
+    df: pd.DataFrame = read_embeddings(dfpath, raw_tasks)
 
     if task_name_maps is not None:
         df = df.rename(task_name_maps, level="task", axis=0)
     if tasks is not None:
-        df = df[df.index.get_level_values("task").isin(tasks, level="task")].reindex(tasks, level="task", axis=0)
+        # Select the rows of each task via the MultiIndex directly, in the order given by tasks
+        present_tasks = set(df.index.unique("task"))
+        df = pd.concat([df.xs(t, level="task", drop_level=False) for t in tasks if t in present_tasks])
     viz.plot_embeddings(embedded_data=df, indices=[["model", "task", ], None], save_data=True, output_dir=dest,
                         file_prefix=prefix, suptitle=None, palette='RdYlGn_r')
     del(df)
@@ -2,10 +2,50 @@ import torch
 import numpy as np
 import logging
 from bnnbench.models import BaseModel
-from scipy.stats import norm
 
 logger = logging.getLogger(__name__)
 
+_LOG_2PI = np.log(2 * np.pi)
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _welford_mean_var(samples):
+        S, N, D = samples.shape
+        mean = np.zeros((N, D))
+        var = np.zeros((N, D))
+        for n in prange(N):
+            for d in range(D):
+                m = 0.
+                m2 = 0.
+                for s in range(S):
+                    x = samples[s, n, d]
+                    delta = x - m
+                    m += delta / (s + 1)
+                    m2 += delta * (x - m)
+                mean[n, d] = m
+                var[n, d] = m2 / S
+        return mean, var
+
+
+def mc_mean_var(samples: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    Calculates the mean and (biased) variance of a set of MC samples along the first axis. If numba is available, both
+    are computed in a single parallel pass over the samples using Welford's algorithm.
+    :param samples: (S, N, D)
+        Array of S sampled model outputs for N data points.
+    :return: mean, variance
+        Two arrays of shape (N, D).
+    """
+    if njit is not None and samples.ndim == 3:
+        return _welford_mean_var(samples)
+    return np.mean(samples, axis=0, dtype=np.float64), np.var(samples, axis=0, dtype=np.float64)
+
 
 def evaluate_rmse(model_obj: BaseModel, X_test, y_test) -> (np.ndarray,):
     """
@@ -65,7 +105,15 @@ def evaluate_rmse_ll(model_obj: BaseModel, X_test, y_test, **kwargs) -> (np.ndar
 
     rmse = np.mean((means.squeeze() - y_test.squeeze()) ** 2) ** 0.5
     vars = np.clip(vars, a_min=1e-6, a_max=None)
-    ll = norm.logpdf(y_test, loc=means, scale=np.sqrt(vars))
+    # Gaussian log-likelihood -0.5 * (log(2 * pi) + log(var) + (y - mean) ** 2 / var), evaluated in-place on a single
+    # buffer in order to avoid allocating a temporary array for every intermediate term.
+    ll = np.subtract(y_test, means, dtype=float)
+    ll *= ll
+    ll /= vars
+    # vars is a fresh copy generated by np.clip and is not needed after this, so take the logarithm in-place
+    ll += np.log(vars, out=vars)
+    ll += _LOG_2PI
+    ll *= -0.5
     ll_mean = np.mean(ll)
     ll_std = np.std(ll)
 
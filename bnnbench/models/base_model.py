@@ -310,7 +310,8 @@ class BaseModel(object):
         for start_idx in range(0, inputs.shape[0] - batchsize + 1, batchsize):
             excerpt = indices[start_idx:start_idx + batchsize]
             if as_tensor:
-                yield torch.Tensor(inputs[excerpt]), torch.Tensor(targets[excerpt])
+                yield torch.from_numpy(np.ascontiguousarray(inputs[excerpt], dtype=np.float32)), \
+                      torch.from_numpy(np.ascontiguousarray(targets[excerpt], dtype=np.float32))
             else:
                 yield inputs[excerpt], targets[excerpt]
 
@@ -1,5 +1,6 @@
 import logging
 import time
+import warnings
 import numpy as np
 
 import torch
@@ -111,8 +112,8 @@ class BatchNorm(BaseModel):
         self.batchnorm_layers = []
 
         for layer_ctr in range(n_units.shape[0] - 1):
-            in_features = n_units[layer_ctr]
-            out_features = n_units[layer_ctr + 1]
+            in_features = int(n_units[layer_ctr])
+            out_features = int(n_units[layer_ctr + 1])
 
             self.model.add_module(
                 "FC_{0}".format(layer_ctr),
@@ -140,7 +141,14 @@ class BatchNorm(BaseModel):
             )
             self.model.add_module("Tanh_{0}".format(layer_ctr), nn.Tanh())
 
-        self.model.add_module("Output", nn.Linear(n_units[-1], output_dims))
+        self.model.add_module("Output", nn.Linear(int(n_units[-1]), output_dims))
+        # self.model stays an eager module, so that hook-based tools such as torchsummary keep working on it. Training
+        # and prediction run through a TorchScript copy instead, which shares all parameters and buffers with it but
+        # skips the Python-level dispatch of nn.Sequential for every layer.
+        with warnings.catch_warnings():
+            # Newer torch versions deprecate torch.jit.script, which would otherwise warn on every model build
+            warnings.simplefilter("ignore", FutureWarning)
+            self._scripted_model = torch.jit.script(self.model)
 
     def fit(self, X, y, **kwargs):
         r"""
@@ -175,27 +183,27 @@ class BatchNorm(BaseModel):
                                                         dtype=torch.float, requires_grad=False))
 
         # Start training
-        self.model.train()
+        self._scripted_model.train()
         lc = np.zeros([self.mlp_params["num_epochs"]])
         for epoch in range(self.mlp_params["num_epochs"]):
 
             epoch_start_time = time.time()
 
-            train_err = 0
+            train_err = 0.
             train_batches = 0
 
             for inputs, targets in self.iterate_minibatches(self.X, self.y, shuffle=True, as_tensor=True):
                 optimizer.zero_grad()
-                output = self.model(inputs)
+                output = self._scripted_model(inputs)
 
                 loss = torch.nn.functional.mse_loss(output, targets)
                 loss.backward()
                 optimizer.step()
 
-                train_err += loss
+                train_err += loss.detach()
                 train_batches += 1
 
-            lc[epoch] = train_err / train_batches
+            lc[epoch] = (train_err / train_batches).item()
             curtime = time.time()
             epoch_time = curtime - epoch_start_time
             total_time = curtime - start_time
@@ -207,7 +215,7 @@ class BatchNorm(BaseModel):
             if epoch % 100 == 99:
                 logger.debug("Epoch {} of {}".format(epoch + 1, self.mlp_params["num_epochs"]))
                 logger.debug("Epoch time {:.3f}s, total time {:.3f}s".format(epoch_time, total_time))
-                logger.debug("Training loss:\t\t{:.5g}".format(train_err / train_batches))
+                logger.debug("Training loss:\t\t{:.5g}".format(lc[epoch]))
                 if self.log_plots:
                     try:
                         plotter = kwargs["plotter"]
@@ -245,9 +253,9 @@ class BatchNorm(BaseModel):
         # Sample a number of predictions for each given point
         # Generate mean and variance for each given point from sampled predictions
 
-        X_ = torch.Tensor(X_)
-        self.model.eval()
-        Yt_hat = self.model(X_).data.cpu().numpy()
+        X_ = torch.from_numpy(np.ascontiguousarray(X_, dtype=np.float32))
+        self._scripted_model.eval()
+        Yt_hat = self._scripted_model(X_).data.cpu().numpy()
 
         if self.normalize_output:
             Yt_hat = zero_mean_unit_var_denormalization(Yt_hat, self.y_mean, self.y_std)
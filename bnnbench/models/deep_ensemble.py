@@ -81,7 +81,7 @@ class Learner(MLP):
         # Sample a number of predictions for each given point
         # Generate mean and std dev for each given point from sampled predictions
 
-        X_ = torch.Tensor(X_)
+        X_ = torch.from_numpy(np.ascontiguousarray(X_, dtype=np.float32))
         Yt_hat = self.network(X_).data.cpu().numpy()
         means = Yt_hat[:, 0]
         stds = Yt_hat[:, 1]
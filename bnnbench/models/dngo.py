@@ -323,7 +323,7 @@ class DNGO(MLP):
 
         # Get features from the net
 
-        theta = self.basis_funcs(torch.Tensor(X_)).data.numpy()
+        theta = self.basis_funcs(torch.from_numpy(np.ascontiguousarray(X_, dtype=np.float32))).data.numpy()
 
         # Marginalise predictions over hyperparameters of the BLR
         mu = np.zeros([len(self.models), X_test.shape[0]])
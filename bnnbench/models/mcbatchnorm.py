@@ -2,15 +2,15 @@ import numpy as np
 
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import logging
 
 from bnnbench.models.mlp import MLP
-from bnnbench.models.auxiliary_funcs import evaluate_rmse_ll
-from bnnbench.utils.normalization import zero_mean_unit_var_normalization, zero_mean_unit_var_denormalization
+from bnnbench.models.auxiliary_funcs import evaluate_rmse_ll, mc_mean_var
+from bnnbench.utils.normalization import zero_mean_unit_var_normalization
 from bnnbench.config import globalConfig
 from functools import partial
 from collections import OrderedDict, namedtuple
-from ConfigSpace import ConfigurationSpace, Configuration, UniformFloatHyperparameter, UniformIntegerHyperparameter
 from scipy.stats import norm
 
 # TODO: Switch to globalConfig, if needed
@@ -23,6 +23,11 @@ class MCBatchNorm(MLP):
     Extends the MLP model by adding a Batch Normalization layer after each fully connected layer, and generates the
     predictive mean as well as variance as model output.
     """
+    # Attributes that are not meant to be modifiable model parameters go here
+    # Number of concurrent jobs, as interpreted by joblib, used for training the sampled configurations during internal
+    # hyper-parameter optimization.
+    hpo_n_jobs: int = -1
+
     # Add any new parameters needed exclusively by this model here
     __modelParamsDefaultDict = {
         "learn_affines": True,
@@ -137,18 +142,18 @@ class MCBatchNorm(MLP):
             logger.debug("Performing internal hyper-parameter optimization of MC-BatchNorm Model.")
             from sklearn.model_selection import train_test_split
             from math import log10, floor
-            cs = ConfigurationSpace(name="PyBNN MC-BatchNorm Benchmark", seed=self.rng.randint(0, 1_000_000_000))
             # TODO: Compare UniformFloat vs Categorical (the way Gal has implemented it)
 
             inv_var_y = 1. / np.var(y)  # Assume y is 1-D
             tau_range_lower = int(floor(log10(inv_var_y * 0.5))) - 1
             tau_range_upper = int(floor(log10(inv_var_y * 2))) + 1
-            cs.add_hyperparameter(UniformIntegerHyperparameter(name="batch_size", lower=5, upper=10))
-            cs.add_hyperparameter(UniformIntegerHyperparameter(name="weight_decay", lower=-15, upper=-1))
-            # cs.add_hyperparameter(UniformIntegerHyperparameter(name="num_epochs", lower=5, upper=20))
-            cs.add_hyperparameter(UniformFloatHyperparameter(name="precision", lower=10 ** tau_range_lower,
-                                                             upper=10 ** tau_range_upper))
-            confs = cs.sample_configuration(self.num_confs)
+            # All hyper-parameters are independent uniform draws, so sample every configuration at once: batch_size
+            # in [5, 10], weight_decay in [-15, -1] (both as exponents) and precision in [10^lower, 10^upper].
+            confs = [{"batch_size": int(bsz), "weight_decay": int(wd), "precision": float(prec)}
+                     for bsz, wd, prec in zip(self.rng.randint(5, 11, size=self.num_confs),
+                                              self.rng.randint(-15, 0, size=self.num_confs),
+                                              self.rng.uniform(10 ** tau_range_lower, 10 ** tau_range_upper,
+                                                               size=self.num_confs))]
             logger.debug("Generated %d random configurations." % self.num_confs)
 
             Xtrain, Xval, ytrain, yval = train_test_split(X, y, train_size=0.8, shuffle=True, random_state=self.rng)
@@ -159,24 +164,24 @@ class MCBatchNorm(MLP):
             old_tblog_flag = globalConfig.tblog
             globalConfig.tblog = False  # Disable Tensorboard logging if it was on since it's not needed here.
 
-            for idx, conf in enumerate(confs):
-                logger.debug("Training configuration #%d" % (idx + 1))
-                logger.debug("Sampled configuration %s" % conf)
-
-                new_model = MCBatchNorm()
-                new_model.model_params = self.model_params._replace(**{
-                    "batch_size": 2 ** conf.get("batch_size"),
-                    "weight_decay": 10 ** conf.get("weight_decay"),
-                    # "num_epochs": 100 * conf.get("num_epochs"),
-                    "num_epochs": self.num_epochs // 10,
-                    "precision": conf.get("precision")
-                })
-                new_model.preprocess_training_data(Xtrain, ytrain)
-                new_model.train_network()
-                logger.debug("Finished training sample network.")
-
-                # Set validation loss to mean NLL
-                valid_loss = -new_model.evaluate(X_test=Xval, y_test=yval, nsamples=500)["LogLikelihood"]
+            # Each configuration gets its own seed so that parallel workers don't replay identical copies of self.rng.
+            # Parameters are passed on as dicts since the dynamically generated namedtuple types cannot be pickled.
+            seeds = self.rng.randint(0, 1_000_000_000, size=len(confs))
+            conf_params = [self.model_params._replace(**{
+                "batch_size": 2 ** conf.get("batch_size"),
+                "weight_decay": 10 ** conf.get("weight_decay"),
+                # "num_epochs": 100 * conf.get("num_epochs"),
+                "num_epochs": self.num_epochs // 10,
+                "precision": conf.get("precision"),
+                "rng": int(seed)
+            })._asdict() for conf, seed in zip(confs, seeds)]
+
+            from joblib import Parallel, delayed
+            valid_losses = Parallel(n_jobs=self.hpo_n_jobs, backend="loky")(
+                delayed(_train_one_conf)(params, Xtrain, ytrain, Xval, yval) for params in conf_params)
+
+            for idx, (conf, valid_loss) in enumerate(zip(confs, valid_losses)):
+                logger.debug("Trained configuration #%d: %s" % (idx + 1, conf))
                 logger.debug("Generated validation loss %f" % valid_loss)
 
                 res = (valid_loss, conf)
@@ -186,7 +191,6 @@ class MCBatchNorm(MLP):
                     logger.debug("Updated validation loss %f, optimum configuration to %s" % optim)
 
                 history.append(res)
-                del new_model # Conserve memory
 
             logger.info("Training final model using optimal configuration %s\n" % optim[1])
             globalConfig.tblog = old_tblog_flag
@@ -239,38 +243,97 @@ class MCBatchNorm(MLP):
         # Sample a number of predictions for each given point
         # Generate mean and variance for each given point from sampled predictions
 
-        X_ = torch.Tensor(X_)
-        Yt_hat = []
-
-        # We want to generate 'nsamples' minibatches
-        for ctr in range(nsamples * self.batch_size // self.X.shape[0]):
-            for batch_inputs, _ in self.iterate_minibatches(self.X, self.y, shuffle=True, as_tensor=True):
-                # Reset all previous running statistics for all BatchNorm layers
-                [layer.reset_running_stats() for layer in self.batchnorm_layers]
+        X_ = torch.from_numpy(np.ascontiguousarray(X_, dtype=np.float32))
 
-                # Perform a forward pass on one mini-batch in training mode in order to update running statistics with
-                # only one mini-batch's mean and variance
-                self.network.train()
-                _ = self.network(batch_inputs)
+        # We want to generate 'nsamples' minibatches, so preallocate the output tensor for all of them at once.
+        n_outer = nsamples * self.batch_size // self.X.shape[0]
+        n_minibatches = max(self.X.shape[0] // self.batch_size, 1)
+        Yt_hat = torch.empty((n_outer * n_minibatches, X_.shape[0], self.output_dims), dtype=X_.dtype)
 
-                # Switch to evaluation mode and perform a forward pass on the points to be evaluated, which will use
-                # the running statistics to perform batch normalization
-                self.network.eval()
-                Yt_hat.append(self.network(X_).data.cpu().numpy())
+        ctr = 0
+        # None of the sampling passes need gradients, so skip building the autograd graph altogether
+        with torch.no_grad():
+            self.network.eval()
+            for _ in range(n_outer):
+                for batch_inputs, _ in self.iterate_minibatches(self.X, self.y, shuffle=True, as_tensor=True):
+                    Yt_hat[ctr] = self._mc_forward(batch_inputs, X_)
+                    ctr += 1
 
-        logger.debug("Generated outputs list of length %d" % (len(Yt_hat)))
+        logger.debug("Generated outputs tensor with %d samples" % ctr)
 
-        if self.normalize_output:
-            from functools import partial
-            denorm = partial(zero_mean_unit_var_denormalization, mean=self.y_mean, std=self.y_std)
-            Yt_hat = np.array(list(map(denorm, Yt_hat)))
-        else:
-            Yt_hat = np.array(Yt_hat)
+        # A single host transfer, the samples are only denormalized after being reduced to their moments in predict()
+        Yt_hat = Yt_hat.cpu().numpy()
 
         logger.debug("Generated final outputs array of shape %s" % str(Yt_hat.shape))
 
         return Yt_hat
 
+    def _mc_forward(self, batch_inputs, X_):
+        r"""
+        Generates one MC-BatchNorm sample for the given points. Equivalent to resetting the running statistics of all
+        BatchNorm layers, performing a forward pass on one mini-batch in training mode in order to update them with only
+        that mini-batch's mean and variance, and then performing a forward pass on the points to be evaluated in
+        evaluation mode. Since the evaluation mode BatchNorm following a fully connected layer is a fixed affine
+        transformation once the mini-batch's statistics are known, the two are folded into a single linear layer for
+        the points to be evaluated. The statistics are only ever held as local tensors, so the BatchNorm buffers of the
+        network are neither reset nor written to.
+
+        Parameters
+        ----------
+        batch_inputs: torch.Tensor (B, D)
+            One mini-batch of training inputs
+        X_: torch.Tensor (N, D)
+            N (normalized) input test points
+
+        Returns
+        ----------
+        torch.Tensor (N, output_dims)
+            Network outputs for the test points
+        """
+
+        batch_h, test_h = batch_inputs, X_
+        layers = list(self.network)
+        idx = 0
+        while idx < len(layers):
+            module = layers[idx]
+            bn = layers[idx + 1] if idx + 1 < len(layers) else None
+
+            if isinstance(module, nn.Linear) and isinstance(bn, nn.BatchNorm1d) and bn.track_running_stats:
+                batch_h = module(batch_h)
+
+                # Running statistics after a reset followed by a single training mode forward pass
+                mean = batch_h.mean(dim=0)
+                var = batch_h.var(dim=0, unbiased=True)
+                if bn.momentum is None:
+                    running_mean, running_var = mean, var
+                else:
+                    running_mean = bn.momentum * mean
+                    running_var = (1. - bn.momentum) + bn.momentum * var
+                batch_h = F.batch_norm(batch_h, None, None, bn.weight, bn.bias, training=True, eps=bn.eps)
+
+                # W' = gamma / sqrt(var + eps) * W, b' = gamma * (b - mean) / sqrt(var + eps) + beta
+                scale = torch.rsqrt(running_var + bn.eps)
+                if bn.weight is not None:
+                    scale = scale * bn.weight
+                shift = -running_mean if module.bias is None else module.bias - running_mean
+                shift = shift * scale
+                if bn.bias is not None:
+                    shift = shift + bn.bias
+                test_h = F.linear(test_h, module.weight * scale[:, None], shift)
+                idx += 2
+                continue
+
+            if isinstance(module, nn.BatchNorm1d):
+                # Without running statistics, BatchNorm always normalizes using the statistics of its own input
+                test_h = F.batch_norm(test_h, None, None, module.weight, module.bias, training=True, eps=module.eps)
+                batch_h = F.batch_norm(batch_h, None, None, module.weight, module.bias, training=True, eps=module.eps)
+            else:
+                batch_h = module(batch_h)
+                test_h = module(test_h)
+            idx += 1
+
+        return test_h
+
     def predict(self, X_test, nsamples=500):
         """
         Given a set of input data features and the number of samples, returns the corresponding predictive means and
@@ -284,8 +347,12 @@ class MCBatchNorm(MLP):
             Two NumPy arrays of shape [N, 1].
         """
         mc_pred = self._predict_mc(X_test=X_test, nsamples=nsamples)
-        mean = np.mean(mc_pred, axis=0)
-        var = (1 / self.precision) + np.var(mc_pred, axis=0)
+        mean, var = mc_mean_var(mc_pred)
+        if self.normalize_output:
+            # Denormalizing the float64 moments instead of the float32 samples keeps the outputs' full precision
+            mean = mean * self.y_std + self.y_mean
+            var = var * self.y_std ** 2
+        var += 1 / self.precision
         if mean.ndim == 1:
             mean = mean[:, np.newaxis]
         if var.ndim == 1:
@@ -306,3 +373,20 @@ class MCBatchNorm(MLP):
         """
 
         return evaluate_rmse_ll(model_obj=self, X_test=X_test, y_test=y_test, nsamples=nsamples)
+
+
+def _train_one_conf(model_params, Xtrain, ytrain, Xval, yval) -> float:
+    """
+    Trains a single MC-BatchNorm model using the given model parameters and returns its validation loss, i.e. the mean
+    negative log-likelihood over the given validation set. Defined at module level so that it can be dispatched to
+    worker processes during internal hyper-parameter optimization.
+    """
+
+    new_model = MCBatchNorm()
+    new_model.model_params = model_params
+    new_model.preprocess_training_data(Xtrain, ytrain)
+    new_model.train_network()
+    logger.debug("Finished training sample network.")
+
+    # Set validation loss to mean NLL
+    return -new_model.evaluate(X_test=Xval, y_test=yval, nsamples=500)["LogLikelihood"]
@@ -7,8 +7,8 @@ from typing import Iterable, Union, Any
 import logging
 
 from bnnbench.models.mlp import MLP
-from bnnbench.models.auxiliary_funcs import evaluate_rmse_ll
-from bnnbench.utils.normalization import zero_mean_unit_var_normalization, zero_mean_unit_var_denormalization
+from bnnbench.models.auxiliary_funcs import evaluate_rmse_ll, mc_mean_var
+from bnnbench.utils.normalization import zero_mean_unit_var_normalization
 from collections import OrderedDict, namedtuple
 from ConfigSpace import ConfigurationSpace, Configuration, UniformFloatHyperparameter
 from torch.optim.lr_scheduler import StepLR as steplr
@@ -271,7 +271,8 @@ class MCDropout(MLP):
         Returns
         ----------
         np.array(nsamples, N)
-            Model predictions for each stochastic forward pass
+            Model predictions for each stochastic forward pass, in the normalized output space if normalize_output is
+            set
         """
         # Normalize inputs
         if self.normalize_input:
@@ -279,21 +280,19 @@ class MCDropout(MLP):
         else:
             X_ = X_test
 
-        X_ = torch.Tensor(X_)
+        X_ = torch.from_numpy(np.ascontiguousarray(X_, dtype=np.float32))
 
         # Keep dropout on for MC-Dropout predictions
-        # Sample a number of predictions for each given point
+        # Sample a number of predictions for each given point, writing each sample into a single preallocated tensor
+        Yt_hat = torch.empty((nsamples, X_.shape[0], self.output_dims), dtype=X_.dtype)
 
         self.network.train()
-        if self.normalize_output:
-            Yt_hat = np.array(
-                [zero_mean_unit_var_denormalization(
-                    self.network(X_).data.cpu().numpy(),
-                    self.y_mean,
-                    self.y_std
-                ) for _ in range(nsamples)])
-        else:
-            Yt_hat = np.array([self.network(X_).data.cpu().numpy() for _ in range(nsamples)])
+        with torch.no_grad():
+            for i in range(nsamples):
+                Yt_hat[i] = self.network(X_)
+
+        # The samples are only denormalized after being reduced to their moments in predict()
+        Yt_hat = Yt_hat.cpu().numpy()
 
         logger.debug("Generated final outputs array of shape %s" % str(Yt_hat.shape))
 
@@ -312,8 +311,12 @@ class MCDropout(MLP):
             Two NumPy arrays of shape [N, 1].
         """
         mc_pred = self._predict_mc(X_test=X_test, nsamples=nsamples)
-        mean = np.mean(mc_pred, axis=0)
-        var = (1 / self.precision) + np.var(mc_pred, axis=0)
+        mean, var = mc_mean_var(mc_pred)
+        if self.normalize_output:
+            # Denormalizing the float64 moments instead of the float32 samples keeps the outputs' full precision
+            mean = mean * self.y_std + self.y_mean
+            var = var * self.y_std ** 2
+        var += 1 / self.precision
         if mean.ndim == 1:
             mean = mean[:, np.newaxis]
         if var.ndim == 1:
@@ -224,7 +224,8 @@ class MLP(BaseModel):
 
             epoch_start_time = time.time()
 
-            train_err = 0
+            # Detached losses are summed as a tensor and only converted to a float once per epoch
+            train_err = 0.
             train_batches = 0
 
             for inputs, targets in self.iterate_minibatches(self.X, self.y, shuffle=True, as_tensor=True):
@@ -234,10 +235,10 @@ class MLP(BaseModel):
                 loss.backward()
                 self.optimizer.step()
 
-                train_err += loss
+                train_err += loss.detach()
                 train_batches += 1
 
-            lc[epoch] = train_err / train_batches
+            lc[epoch] = (train_err / train_batches).item()
             curtime = time.time()
             epoch_time = curtime - epoch_start_time
             total_time = curtime - start_time
@@ -265,7 +266,7 @@ class MLP(BaseModel):
             if epoch % 100 == 99:
                 logger.info("Epoch {} of {}".format(epoch + 1, self.num_epochs))
                 logger.info("Epoch time {:.3f}s, total time {:.3f}s".format(epoch_time, total_time))
-                logger.info("Training loss:\t\t{:.5g}\n".format(train_err / train_batches))
+                logger.info("Training loss:\t\t{:.5g}\n".format(lc[epoch]))
 
                 if globalConfig.tblog and globalConfig.logTrainPerformance:
                     try:
@@ -311,7 +312,7 @@ class MLP(BaseModel):
         else:
             X_ = X_test
 
-        X_ = torch.Tensor(X_)
+        X_ = torch.from_numpy(np.ascontiguousarray(X_, dtype=np.float32))
         self.network.eval()
         Yt_hat = self.network(X_).data.cpu().numpy()
 
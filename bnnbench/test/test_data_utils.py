@@ -0,0 +1,242 @@
+import os
+import functools
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+import numpy as np
+
+from bnnbench.utils import data_utils
+
+
+def _both_paths(test):
+    """ Runs the decorated test once as is and once with the numba kernels disabled. """
+
+    @functools.wraps(test)
+    def wrapper(self):
+        with self.subTest(numba=data_utils.njit is not None):
+            test(self)
+        with self.subTest(numba=False), mock.patch.object(data_utils, "njit", None):
+            test(self)
+
+    return wrapper
+
+
+class TestExcludeIndices(unittest.TestCase):
+    @_both_paths
+    def test_complement(self):
+        result = data_utils.exclude_indices(10, [7, 2, 3])
+        np.testing.assert_array_equal(result, [0, 1, 4, 5, 6, 8, 9])
+        self.assertEqual(result.dtype, np.int64)
+
+    @_both_paths
+    def test_duplicates(self):
+        np.testing.assert_array_equal(data_utils.exclude_indices(5, [1, 3, 1, 3]), [0, 2, 4])
+
+    @_both_paths
+    def test_empty(self):
+        np.testing.assert_array_equal(data_utils.exclude_indices(4, []), [0, 1, 2, 3])
+        np.testing.assert_array_equal(data_utils.exclude_indices(0, []), [])
+
+    @_both_paths
+    def test_exclude_all(self):
+        np.testing.assert_array_equal(data_utils.exclude_indices(4, np.arange(4)), [])
+
+    @_both_paths
+    def test_boundaries(self):
+        np.testing.assert_array_equal(data_utils.exclude_indices(5, [0, 4]), [1, 2, 3])
+
+    @_both_paths
+    def test_out_of_range(self):
+        with self.assertRaises(IndexError):
+            data_utils.exclude_indices(5, [5])
+        with self.assertRaises(IndexError):
+            data_utils.exclude_indices(5, [-1, 2])
+        with self.assertRaises(IndexError):
+            data_utils.exclude_indices(0, [0])
+
+    @_both_paths
+    def test_matches_mask(self):
+        rng = np.random.RandomState(1)
+        for npoints in (1, 17, 1000):
+            indices = rng.randint(0, npoints, size=rng.randint(0, npoints + 1))
+            mask = np.ones(npoints, dtype=bool)
+            mask[indices] = False
+            np.testing.assert_array_equal(data_utils.exclude_indices(npoints, indices), np.arange(npoints)[mask])
+
+
+class TestEvaluationSubsets(unittest.TestCase):
+    """ HPOBenchData._generate_evaluation_subsets() yields the same preallocated buffers for every subset, overwriting
+    them in-place, and only allocates new buffers when the shapes or dtypes of the dataset change. """
+
+    N, i = 20, 4
+
+    def setUp(self):
+        # Nothing is read from disk as long as none of the benchmark's data is accessed
+        self.data = data_utils.HPOBenchData("unused", None, 1, self.i, rng=1)
+        self.dataset = self._dataset(np.float64)
+
+    def _dataset(self, dtype, N=None):
+        # Every entry encodes its configuration and evaluation, so that the chosen evaluation can be recovered
+        N = self.N if N is None else N
+        codes = (np.arange(N)[:, None] * self.i + np.arange(self.i)[None, :]).astype(dtype)
+        return codes[:, :, None].repeat(3, axis=2), -codes[:, :, None], 2 * codes[:, :, None].repeat(2, axis=2)
+
+    def _assert_consistent(self, subset, N=None):
+        # All three arrays must pick the same evaluation of each configuration
+        N = self.N if N is None else N
+        X, y, meta = subset
+        self.assertEqual((X.shape, y.shape, meta.shape), ((N, 3), (N, 1), (N, 2)))
+        evals = X[:, 0] - np.arange(N) * self.i
+        self.assertTrue(np.all((evals >= 0) & (evals < self.i)))
+        np.testing.assert_array_equal(X, X[:, :1].repeat(3, axis=1))
+        np.testing.assert_array_equal(y[:, 0], -X[:, 0])
+        np.testing.assert_array_equal(meta, 2 * X[:, :2])
+
+    @_both_paths
+    def test_buffers_reused_between_subsets(self):
+        subsets = self.data._generate_evaluation_subsets(self.dataset, rng=1)
+        first = next(subsets)
+        self._assert_consistent(first)
+        previous = [arr.copy() for arr in first]
+
+        changed = False
+        for _ in range(5):
+            subset = next(subsets)
+            self._assert_consistent(subset)
+            for buf, arr in zip(first, subset):
+                self.assertIs(buf, arr)
+            changed |= any(not np.array_equal(old, new) for old, new in zip(previous, subset))
+        self.assertTrue(changed, "The buffers were never overwritten with a new subset.")
+
+    @_both_paths
+    def test_buffers_shared_between_generators(self):
+        first = next(self.data._generate_evaluation_subsets(self.dataset, rng=1))
+        second = next(self.data._generate_evaluation_subsets(self.dataset, rng=2))
+        for buf, arr in zip(first, second):
+            self.assertIs(buf, arr)
+        self._assert_consistent(second)
+
+    @_both_paths
+    def test_buffers_reallocated_on_change(self):
+        first = next(self.data._generate_evaluation_subsets(self.dataset, rng=1))
+
+        subset = next(self.data._generate_evaluation_subsets(self._dataset(np.float32), rng=1))
+        self.assertTrue(all(arr.dtype == np.float32 for arr in subset))
+        self.assertTrue(all(new is not old for new, old in zip(subset, first)))
+        self._assert_consistent(subset)
+
+        subset = next(self.data._generate_evaluation_subsets(self._dataset(np.float64, N=7), rng=1))
+        self._assert_consistent(subset, N=7)
+
+
+class TestLocalDataset(unittest.TestCase):
+    """ Index files written with np.savetxt's default float format, e.g. 3.000000000000000000e+00, must be read just
+    like integer-formatted ones. """
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.root = self._tmpdir.name
+        self.datadir = os.path.join(self.root, "toy", data_utils.DATADIR)
+        os.makedirs(self.datadir)
+
+        rng = np.random.RandomState(1)
+        self.data = rng.rand(30, 4)
+        self.splits = [tuple(np.split(rng.permutation(30), [24])) for _ in range(2)]
+        np.savetxt(os.path.join(self.datadir, data_utils.DATAFILE), self.data)
+        np.savetxt(os.path.join(self.datadir, data_utils.FEATURE_INDEX_FILE), [0, 1, 2])
+        np.savetxt(os.path.join(self.datadir, data_utils.TARGET_INDEX_FILE), [3])
+        for i, (train, test) in enumerate(self.splits):
+            np.savetxt(os.path.join(self.datadir, f"{data_utils.TRAINSET_INDICES_PREFIX}{i}.txt"), train)
+            np.savetxt(os.path.join(self.datadir, f"{data_utils.TESTSET_INDICES_PREFIX}{i}.txt"), test)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_float_formatted_indices(self):
+        loaded = list(data_utils._generate_test_splits_from_local_dataset("toy", root=self.root, splits=(0, 2)))
+        self.assertEqual(len(loaded), 2)
+        for (train_X, train_y, test_X, test_y), (train, test) in zip(loaded, self.splits):
+            np.testing.assert_array_equal(train_X, self.data[train, :3])
+            np.testing.assert_array_equal(train_y, self.data[train, 3])
+            np.testing.assert_array_equal(test_X, self.data[test, :3])
+            np.testing.assert_array_equal(test_y, self.data[test, 3])
+
+    def test_non_integral_index(self):
+        path = os.path.join(self.datadir, "index_bad.txt")
+        np.savetxt(path, [1.5])
+        with self.assertRaises(ValueError):
+            data_utils._read_int_indices(path)
+
+
+class TestBenchmarkTable(unittest.TestCase):
+    """ Failed evaluations are written as empty fields by DataFrame.to_csv, or may show up as nan, and must be read as
+    NaN instead of making the whole benchmark unreadable. """
+
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.data_file = Path(self._tmpdir.name) / "bench_data.csv"
+        with open(self.data_file, "w") as fp:
+            fp.write("0.5 1 2.5\n1.5  3.5\n2.5 nan 4.5\n")
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _check(self):
+        table = data_utils._read_benchmark_table(self.data_file, ("a", "b", "c"), (0, 1, 2))
+        np.testing.assert_array_equal(table.to_numpy(), [[0.5, 1., 2.5], [1.5, np.nan, 3.5], [2.5, np.nan, 4.5]])
+        table = data_utils._read_benchmark_table(self.data_file, ("a", "b", "c"), (1,))
+        np.testing.assert_array_equal(table.to_numpy(), [[1.], [np.nan], [np.nan]])
+
+    def test_missing_values(self):
+        self._check()
+
+    def test_missing_values_without_pyarrow(self):
+        with mock.patch.object(data_utils, "pyarrow", None):
+            self._check()
+
+    def _check_meta_dtype(self):
+        with open(self.data_file, "w") as fp:
+            fp.write("0.5 1 2\n1.5 3 4\n")
+        table, features, outputs, meta = data_utils._read_benchmark_columns(self.data_file, ("a", "b", "c"), [1], [0],
+                                                                            [2])
+        self.assertEqual(table.iloc[:, features[0]].dtype, np.float64)
+        self.assertEqual(table.iloc[:, outputs[0]].dtype, np.float64)
+        self.assertEqual(table.iloc[:, meta[0]].dtype, np.int64)
+
+    def test_meta_keeps_inferred_dtype(self):
+        self._check_meta_dtype()
+
+    def test_meta_keeps_inferred_dtype_without_pyarrow(self):
+        with mock.patch.object(data_utils, "pyarrow", None):
+            self._check_meta_dtype()
+
+
+class TestWriteAtomically(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmpdir.name, "arr.npy")
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_write(self):
+        data_utils._write_atomically(self.path, lambda fp: np.save(fp, np.arange(3)))
+        np.testing.assert_array_equal(np.load(self.path), np.arange(3))
+        self.assertEqual(os.listdir(self._tmpdir.name), ["arr.npy"])
+
+    def test_failed_write_keeps_previous_file(self):
+        np.save(self.path, np.arange(3))
+
+        def write(fp):
+            fp.write(b"partial")
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            data_utils._write_atomically(self.path, write)
+        np.testing.assert_array_equal(np.load(self.path), np.arange(3))
+        self.assertEqual(os.listdir(self._tmpdir.name), ["arr.npy"])
+
+
+if __name__ == '__main__':
+    unittest.main()
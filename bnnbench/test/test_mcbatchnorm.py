@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+import torch
+
+from bnnbench.models import MCBatchNorm
+
+
+class TestMCForward(unittest.TestCase):
+    """ MCBatchNorm._mc_forward() must reproduce the reference procedure for a single MC sample: reset the running
+    statistics, forward the training mini-batch in training mode and then forward the test points in eval mode. """
+
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        self.X = rng.rand(60, 2)
+        self.y = np.sin(self.X.sum(axis=1) * 3)
+
+    def _check_against_reference(self, **kwargs):
+        model = MCBatchNorm(num_epochs=5, optimize_hypers=False, rng=1, batch_size=10, **kwargs)
+        model.fit(self.X, self.y)
+
+        test_inputs = torch.from_numpy(self.X[:7].astype(np.float32))
+        batch_inputs = torch.from_numpy(self.X[10:20].astype(np.float32))
+        with torch.no_grad():
+            model.network.eval()
+            output = model._mc_forward(batch_inputs, test_inputs)
+
+            for layer in model.batchnorm_layers:
+                layer.reset_running_stats()
+            model.network.train()
+            model.network(batch_inputs)
+            model.network.eval()
+            expected = model.network(test_inputs)
+
+        self.assertEqual(output.shape, expected.shape)
+        self.assertTrue(torch.allclose(output, expected, atol=1e-6))
+
+    def test_running_stats(self):
+        self._check_against_reference()
+
+    def test_no_running_stats(self):
+        self._check_against_reference(running_stats=False)
+
+    def test_cumulative_moving_average(self):
+        self._check_against_reference(bn_momentum=None)
+
+    def test_no_affines(self):
+        self._check_against_reference(learn_affines=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -39,6 +39,9 @@ class FileNames:
     # t-SNE of runhistories
     tsne_embeddings_dataframe = "tsne_embeddings.pkl.gz"
 
+    # Columnar copy of the t-SNE embeddings, supports reading only the rows of selected tasks
+    tsne_embeddings_parquet = "tsne_embeddings.parquet"
+
     # Various visualizations
     mean_std_visualization = "MeanStdViz.png"
     tsne_visualization = "tSNE_Embedding.png"
@@ -1,5 +1,7 @@
 import os
 import logging
+import uuid
+import functools
 import numpy as np
 import pandas as pd
 from pathlib import Path
@@ -14,6 +16,39 @@ from bnnbench.utils import constants as C
 
 _log = logging.getLogger(__name__)
 
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit(cache=True)
+    def _sorted_complement(npoints, sorted_indices):
+        out = np.empty(npoints - sorted_indices.size, dtype=np.int64)
+        j = 0
+        k = 0
+        for i in range(npoints):
+            if j < sorted_indices.size and sorted_indices[j] == i:
+                j += 1
+            else:
+                out[k] = i
+                k += 1
+        return out
+
+    @njit(parallel=True, cache=True)
+    def _gather_evaluations(X, y, meta, choices, out_X, out_y, out_meta):
+        for n in prange(choices.shape[0]):
+            j = choices[n]
+            out_X[n] = X[n, j]
+            out_y[n] = y[n, j]
+            out_meta[n] = meta[n, j]
+
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
 # ################### bnnbench data utils ########################
 
 DATASETS_ROOT = "$HOME/UCI_Datasets"
@@ -23,11 +58,125 @@ FEATURE_INDEX_FILE = "index_features.txt"
 TARGET_INDEX_FILE = "index_target.txt"
 TESTSET_INDICES_PREFIX = "index_test_"
 TRAINSET_INDICES_PREFIX = "index_train_"
+SPLITS_CACHE_FILE = "splits.npz"
+
+
+def _read_file_to_numpy_array(root, filename, dtype=float, **kwargs):
+    """ Reads a whitespace separated text file of numbers into a numpy array using pandas' C parser, which is
+    considerably faster than np.genfromtxt. Single-column files are returned as 1D arrays. """
+    dtype = {int: np.int64, float: np.float64}.get(dtype, dtype)
+    return pd.read_csv(os.path.join(root, filename), header=None, sep=r'\s+', dtype=dtype, engine='c',
+                       float_precision="round_trip", **kwargs).to_numpy().squeeze()
+
+
+def _parse_index(token: str) -> int:
+    """ Parses a single index, which may also be written as a float with an integral value, such as the
+    1.000000000000000000e+00 produced by np.savetxt's default format. """
+    try:
+        return int(token)
+    except ValueError:
+        value = float(token)
+        if not value.is_integer():
+            raise ValueError("Expected an integral index, got %s" % token.strip())
+        return int(value)
+
+
+def _read_int_indices(path) -> np.ndarray:
+    """ Reads a text file containing one integer index per line into a 1D array. This is much cheaper than going
+    through a general purpose parser for the small index files. """
+    with open(path) as fp:
+        return np.fromiter((_parse_index(line) for line in fp if line.strip()), dtype=np.int64)
+
+
+def _write_atomically(path, write: Callable) -> None:
+    """ Creates the file at the given path by passing a binary file object to write(). The data is first written to a
+    temporary file in the same directory, which is then moved into place, such that concurrent readers of the path
+    never encounter a partially written file. Unlike tempfile, this keeps the permissions given by the umask. """
+    tmp = f"{os.fspath(path)}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "xb") as fp:
+            write(fp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _read_file_to_cached_numpy_array(root, filename, dtype=float) -> np.ndarray:
+    """ Same as _read_file_to_numpy_array(), but also stores the parsed array in a .npy file next to the text file.
+    As long as that cache is not older than the text file, it is memory-mapped read-only instead of parsing the text
+    file again. """
+
+    source = os.path.join(root, filename)
+    cache = os.path.splitext(source)[0] + ".npy"
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(source):
+        _log.debug("Loading cached array from %s" % cache)
+        return np.load(cache, mmap_mode='r')
+
+    arr = _read_file_to_numpy_array(root, filename, dtype=dtype)
+    try:
+        _write_atomically(cache, lambda fp: np.save(fp, arr))
+    except OSError as e:
+        _log.debug("Could not cache %s as %s: %s" % (source, cache, str(e)))
+    return arr
+
+
+@functools.lru_cache(maxsize=16)
+def _load_dataset_tables(datadir: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reads the full dataset as well as the feature and target column indices of a locally stored dataset. The results
+    are cached per data directory and shared between all callers, so the returned arrays are read-only.
+    :param datadir: Directory containing the dataset's files.
+    :return: full_dataset, feature_indices, target_indices
+    """
 
+    full_dataset = _read_file_to_cached_numpy_array(datadir, DATAFILE, dtype=float)
+    # Squeezed, such that a single target index still produces 1D targets
+    feature_indices = _read_int_indices(os.path.join(datadir, FEATURE_INDEX_FILE)).squeeze()
+    target_indices = _read_int_indices(os.path.join(datadir, TARGET_INDEX_FILE)).squeeze()
+    for arr in (full_dataset, feature_indices, target_indices):
+        arr.setflags(write=False)
+    return full_dataset, feature_indices, target_indices
+
+
+def _read_split_indices(datadir: str, splits: tuple) -> Sequence[Tuple[np.ndarray, np.ndarray]]:
+    """ Reads the train and test indices of all the given splits of a locally stored dataset at once. On first use,
+    the index files of all splits found in the data directory are collected into a single .npz file, such that
+    subsequent reads only need to open that one file. The .npz file is re-generated if it lacks any requested split or
+    is older than any of the index files.
+    :return: List of tuples (train_indices, test_indices), one per split.
+    """
 
-def _read_file_to_numpy_array(root, filename, *args, **kwargs):
-    with open(os.path.join(root, filename), 'r') as fp:
-        return np.genfromtxt(fp, *args, **kwargs)
+    requested = range(*splits)
+    available = set()
+    newest = 0.
+    for entry in os.scandir(datadir):
+        for prefix in (TRAINSET_INDICES_PREFIX, TESTSET_INDICES_PREFIX):
+            if entry.name.startswith(prefix) and entry.name.endswith('.txt') and \
+                    entry.name[len(prefix):-len('.txt')].isdecimal():
+                newest = max(newest, entry.stat().st_mtime)
+                if prefix == TRAINSET_INDICES_PREFIX:
+                    available.add(int(entry.name[len(prefix):-len('.txt')]))
+
+    cache = os.path.join(datadir, SPLITS_CACHE_FILE)
+    if os.path.exists(cache) and os.path.getmtime(cache) >= newest:
+        with np.load(cache) as npz:
+            if all(f"train_{index}" in npz.files and f"test_{index}" in npz.files for index in requested):
+                _log.debug("Loading split indices from %s" % cache)
+                return [(npz[f"train_{index}"], npz[f"test_{index}"]) for index in requested]
+
+    indices = {}
+    for index in available | set(requested):
+        for key, prefix in (("train", TRAINSET_INDICES_PREFIX), ("test", TESTSET_INDICES_PREFIX)):
+            indices[f"{key}_{index}"] = _read_int_indices(os.path.join(datadir, prefix + str(index) + '.txt'))
+
+    try:
+        _write_atomically(cache, lambda fp: np.savez_compressed(fp, **indices))
+    except OSError as e:
+        _log.debug("Could not cache split indices as %s: %s" % (cache, str(e)))
+
+    return [(indices[f"train_{index}"], indices[f"test_{index}"]) for index in requested]
 
 
 def _generate_test_splits_from_local_dataset(name: str, root: str = DATASETS_ROOT, splits: tuple = None):
@@ -46,25 +195,20 @@ def _generate_test_splits_from_local_dataset(name: str, root: str = DATASETS_ROO
 
     _log.debug("Using splits: %s" % str(splits))
 
-    feature_indices = _read_file_to_numpy_array(datadir, FEATURE_INDEX_FILE, dtype=int)
-    target_indices = _read_file_to_numpy_array(datadir, TARGET_INDEX_FILE, dtype=int)
-    full_dataset = _read_file_to_numpy_array(datadir, DATAFILE, dtype=float)
-
-    for index in range(*splits):
-        split_test_indices = _read_file_to_numpy_array(datadir, TESTSET_INDICES_PREFIX + str(index) + '.txt',
-                                                       dtype=int)
-        split_train_indices = _read_file_to_numpy_array(datadir, TRAINSET_INDICES_PREFIX + str(index) + '.txt',
-                                                        dtype=int)
+    full_dataset, feature_indices, target_indices = _load_dataset_tables(datadir)
+    # The feature and target columns are the same for every split, so gather them only once
+    X_all = full_dataset[:, feature_indices]
+    y_all = full_dataset[:, target_indices]
 
+    # All index files are read up-front, so that only the gathers remain between consecutive splits
+    for split_train_indices, split_test_indices in _read_split_indices(datadir, splits):
         _log.debug("Using %s test indices, stored in variable of type %s, containing dtype %s" %
                    (str(split_test_indices.shape), type(split_test_indices), split_test_indices.dtype))
         _log.debug("Using %s train indices, stored in variable of type %s, containing dtype %s" %
                    (str(split_train_indices.shape), type(split_train_indices), split_train_indices.dtype))
 
-        testdata = full_dataset[split_test_indices, :]
-        traindata = full_dataset[split_train_indices, :]
-        yield traindata[:, feature_indices], traindata[:, target_indices], \
-              testdata[:, feature_indices], testdata[:, target_indices]
+        yield X_all[split_train_indices], y_all[split_train_indices], \
+              X_all[split_test_indices], y_all[split_test_indices]
 
 
 dataloader_args = {
@@ -129,6 +273,86 @@ def get_full_benchmark_name(benchmark: Enum, rng_seed: int, **extra_args) -> str
     return generators[benchmark](rng_seed, **extra_args)
 
 
+def _parquet_schema_matches(parquet_file: Path, columns: Sequence[str], float_columns: Sequence[str]) -> bool:
+    """ Checks whether a parquet file contains all the given columns, storing those in float_columns as float64. """
+    schema = pyarrow.parquet.read_schema(parquet_file)
+    return set(columns).issubset(schema.names) and \
+        all(schema.field(name).type == pyarrow.float64() for name in float_columns)
+
+
+def _read_benchmark_table(data_file: Path, headers: Tuple[str, ...], usecols: Tuple[int, ...],
+                          float_cols: Tuple[int, ...] = ()) -> pd.DataFrame:
+    """ Parses the purely numeric, space separated data file of a sampled benchmark, reading only the columns at the
+    given positions. The columns at the positions in float_cols are parsed as float64, the dtypes of all others are
+    inferred by the parser. If pyarrow is available, a parquet copy of the data file is generated once and all
+    subsequent reads, including those in other processes, only load the required columns from it. The parquet copy
+    only holds the requested columns and is re-generated whenever a read requires a column it lacks or needs a column
+    as float64 that it stores with another type. """
+
+    names = list(headers)
+    columns = [names[i] for i in usecols]
+    dtype = {names[i]: np.float64 for i in float_cols}
+    if pyarrow is not None:
+        parquet_file = data_file.with_suffix(".parquet")
+        try:
+            if not parquet_file.exists() or parquet_file.stat().st_mtime < data_file.stat().st_mtime or \
+                    not _parquet_schema_matches(parquet_file, columns, dtype):
+                _log.info("Generating parquet copy of %s" % str(data_file))
+                table = pd.read_csv(data_file, sep=" ", names=names, usecols=list(usecols), dtype=dtype, engine='c')
+                _write_atomically(parquet_file, lambda fp: table.to_parquet(fp, engine="pyarrow", compression="zstd"))
+            return pd.read_parquet(parquet_file, columns=columns, engine="pyarrow")
+        except OSError as e:
+            _log.debug("Could not use a parquet copy of %s: %s" % (str(data_file), str(e)))
+
+    return pd.read_csv(data_file, sep=" ", names=names, usecols=list(usecols), dtype=dtype, engine='c')
+
+
+def _read_benchmark_columns(data_file: Path, headers: Sequence[str], feature_indices: Sequence[int],
+                            output_indices: Sequence[int], meta_indices: Sequence[int]) -> \
+        Tuple[pd.DataFrame, Sequence[int], Sequence[int], Sequence[int]]:
+    """ Reads only the feature, output and metadata columns of a benchmark's data file. Features and outputs are read
+    as float64, while metadata columns keep the dtype inferred for them. Returns the table along with the given
+    indices, re-mapped to column positions within the returned table. """
+    float_cols = set(feature_indices) | set(output_indices)
+    usecols = tuple(sorted(float_cols | set(meta_indices)))
+    table = _read_benchmark_table(data_file, tuple(headers), usecols, tuple(sorted(float_cols)))
+    position = {col: pos for pos, col in enumerate(usecols)}
+    return table, [position[i] for i in feature_indices], [position[i] for i in output_indices], \
+           [position[i] for i in meta_indices]
+
+
+class DatasetView:
+    """ A subset of the configurations in a full dataset (X, y, meta), identified by their indices along the first
+    axis. Each of the subset's arrays is only gathered from the full dataset when first accessed and then kept for as
+    long as the view itself, i.e. until the owning benchmark's next update(). """
+    __slots__ = ("source", "indices", "_arrays")
+
+    def __init__(self, source: Dataset, indices: np.ndarray):
+        self.source = source
+        self.indices = indices
+        self._arrays = [None, None, None]
+
+    def _gather(self, index: int) -> np.ndarray:
+        if self._arrays[index] is None:
+            self._arrays[index] = self.source[index][self.indices]
+        return self._arrays[index]
+
+    @property
+    def X(self) -> np.ndarray:
+        return self._gather(0)
+
+    @property
+    def y(self) -> np.ndarray:
+        return self._gather(1)
+
+    @property
+    def meta(self) -> np.ndarray:
+        return self._gather(2)
+
+    def materialize(self) -> Dataset:
+        return self.X, self.y, self.meta
+
+
 class BenchmarkData(ABC):
     # The complete dataset
     X_full: np.ndarray
@@ -161,62 +385,146 @@ class HPOBenchData(BenchmarkData):
     def __init__(self, data_folder: Union[str, Path], benchmark_name: Enum, source_rng_seed: int,
                  evals_per_config: int, extension: str = "csv", iterate_confs: bool = True,
                  iterate_evals: bool = False, emukit_map_func: Callable = None, rng: RNG_Input = None,
-                 train_set_multiplier: int = 10, **extra_args):
-        data = HPOBenchData.read_hpobench_data(data_folder=data_folder, benchmark_name=benchmark_name,
-                                               evals_per_config=evals_per_config, rng_seed=source_rng_seed,
-                                               extension=extension, **extra_args)
-        self.X_full, self.Y_full, self.meta_full = data[:3]
-        self.features, self.outputs, self.meta_headers = data[3:]
-        if emukit_map_func is not None:
-            # We are more interested in keeping the configurations in an emukit-compatible format
-            self.X_full = emukit_map_func(self.X_full.reshape((-1, self.X_full.shape[2]))).reshape(self.X_full.shape)
+                 train_set_multiplier: int = 10, dtype: np.dtype = np.float64, **extra_args):
+        # The data itself is only read when it is first needed, see load()
+        self._read_args = dict(data_folder=data_folder, benchmark_name=benchmark_name,
+                               evals_per_config=evals_per_config, rng_seed=source_rng_seed, extension=extension,
+                               dtype=dtype, **extra_args)
+        self._emukit_map_func = emukit_map_func
+        self._iterate_confs = iterate_confs
+        self._iterate_evals = iterate_evals
+        self._train_set_multiplier = train_set_multiplier
+        self._data: Optional[tuple] = None
 
         if rng is None or isinstance(rng, int):
             self.rng = np.random.RandomState(rng)
         else:
             self.rng = rng
 
-        # By default, generate a new split for every update
-        self._conf_splits = self._iterate_dataset_configurations(train_size=train_set_multiplier * self.X_full.shape[2],
-                                                                 rng=self.rng.randint(0, 1_000_000_000))
+        self._conf_splits = None
         self._eval_splits = None  # Only becomes relevant if iterate_confs is False
+        self._train_set: Optional[Dataset] = None
+        self._test_view: Optional[DatasetView] = None
+        self._eval_buffers: Optional[Dataset] = None
+
+    def load(self):
+        """ Reads the benchmark data and sets up the train/test splits, unless this has already been done. This happens
+        automatically as soon as any of the data is accessed, but may also be called in advance, e.g. in order to read
+        the data of several benchmarks concurrently using a thread pool. """
+
+        if self._data is not None:
+            return
+
+        X_full, Y_full, meta_full, *names = HPOBenchData.read_hpobench_data(**self._read_args)
+        if self._emukit_map_func is not None:
+            # We are more interested in keeping the configurations in an emukit-compatible format
+            X_full = self._emukit_map_func(X_full.reshape((-1, X_full.shape[2]))).reshape(X_full.shape)
+        self._data = (X_full, Y_full, meta_full, *names)
 
-        if not iterate_confs:
+        # By default, generate a new split for every update
+        self._conf_splits = self._iterate_dataset_configurations(
+            train_size=self._train_set_multiplier * X_full.shape[2], rng=self.rng.randint(0, 1_000_000_000))
+
+        if not self._iterate_confs:
             _log.debug("Disabling iteration over configuration subsets. Test set will now remain static.")
-            train_set, test_set = next(self._conf_splits)
+            train_ind, test_ind = next(self._conf_splits)
             self._conf_splits = None
-            self.train_X, self.train_Y, self.train_meta = None, None, None
-            self.test_X, self.test_Y, self.test_meta = test_set
-            if iterate_evals:
+            self._test_view = self._view(test_ind)
+            train_set = self._view(train_ind).materialize()
+            if self._iterate_evals:
                 _log.debug("Enabling iteration over evaluation subsets. Training set will now iterate over evaluation "
                            "subsets.")
                 self._eval_splits = self._generate_evaluation_subsets(dataset=train_set, rng=self.rng)
             else:
                 _log.debug("Disabling iteration over evaluation subsets. Training set is now also static.")
-                self.train_X, self.train_Y, self.train_meta = next(HPOBenchData._generate_evaluation_subsets(
-                    dataset=train_set, rng=self.rng))
+                self._train_set = next(self._generate_evaluation_subsets(dataset=train_set, rng=self.rng))
         else:
             _log.debug("Training and test sets will iterate over configuration subsets.")
 
     def update(self):
         """ Update the current data splits. Ideally called in synchrony with Benchmarker's loops. """
+        self.load()
         if self._eval_splits is not None:
             _log.debug("Updating training set by iterating over evaluation subsets. Test set is static.")
-            self.train_X, self.train_Y, self.train_meta = next(self._eval_splits)
+            self._train_set = next(self._eval_splits)
         else:
             if self._conf_splits is not None:
                 _log.debug("Updating training and test sets by iterating over configuration subsets.")
-                train_data, test_data = next(self._conf_splits)
-                self.train_X, self.train_Y, self.train_meta = next(HPOBenchData._generate_evaluation_subsets(
-                    dataset=train_data, rng=self.rng))
-                self.test_X, self.test_Y, self.test_meta = test_data
+                train_ind, test_ind = next(self._conf_splits)
+                self._train_set = next(self._generate_evaluation_subsets(
+                    dataset=self._view(train_ind).materialize(), rng=self.rng))
+                self._test_view = self._view(test_ind)
             else:
                 _log.debug("Training and test sets are static.")
                 pass
 
+    def _view(self, indices: np.ndarray) -> DatasetView:
+        return DatasetView((self.X_full, self.Y_full, self.meta_full), indices)
+
+    def _full_data(self, index: int):
+        self.load()
+        return self._data[index]
+
+    @property
+    def X_full(self) -> np.ndarray:
+        return self._full_data(0)
+
+    @property
+    def Y_full(self) -> np.ndarray:
+        return self._full_data(1)
+
+    @property
+    def meta_full(self) -> np.ndarray:
+        return self._full_data(2)
+
+    @property
+    def features(self) -> np.ndarray:
+        return self._full_data(3)
+
+    @property
+    def outputs(self) -> np.ndarray:
+        return self._full_data(4)
+
+    @property
+    def meta_headers(self) -> np.ndarray:
+        return self._full_data(5)
+
+    def _train_data(self, index: int) -> Optional[np.ndarray]:
+        self.load()
+        return None if self._train_set is None else self._train_set[index]
+
+    @property
+    def train_X(self) -> Optional[np.ndarray]:
+        return self._train_data(0)
+
+    @property
+    def train_Y(self) -> Optional[np.ndarray]:
+        return self._train_data(1)
+
+    @property
+    def train_meta(self) -> Optional[np.ndarray]:
+        return self._train_data(2)
+
+    # The test set is only gathered from the full dataset when it is actually accessed
+    @property
+    def test_X(self) -> Optional[np.ndarray]:
+        self.load()
+        return None if self._test_view is None else self._test_view.X
+
+    @property
+    def test_Y(self) -> Optional[np.ndarray]:
+        self.load()
+        return None if self._test_view is None else self._test_view.y
+
+    @property
+    def test_meta(self) -> Optional[np.ndarray]:
+        self.load()
+        return None if self._test_view is None else self._test_view.meta
+
     @staticmethod
     def read_hpobench_data(data_folder: Union[str, Path], benchmark_name: Enum, rng_seed: int,
-                           evals_per_config: int, extension: str = "csv", **extra_args) -> \
+                           evals_per_config: int, extension: str = "csv", dtype: np.dtype = np.float64,
+                           **extra_args) -> \
             Tuple[np.ndarray, np.ndarray, np.ndarray, Sequence[str], Sequence[str], Sequence[str]]:
         """
         Reads the relevant data of the given hpobench objective from the given folder and returns it as numpy arrays.
@@ -230,6 +538,9 @@ class HPOBenchData(BenchmarkData):
             The number of times each configuration was evaluated.
         :param extension: string
             The file extension.
+        :param dtype: numpy dtype
+            The dtype of the returned X and Y arrays. Surrogate models rarely need more than np.float32, which halves
+            the memory footprint and bandwidth of all training and test sets. Metadata is always returned as read.
         :return: X, Y, metadata, feature_names, target_names, meta_headers
             X, Y and metadata will have shapes [N, evals_per_config, Dx], [N, evals_per_config, Dy] and
             [N, evals_per_config, Dz] respectively, whereas feature_names, target_names and meta_headers will have the
@@ -256,30 +567,49 @@ class HPOBenchData(BenchmarkData):
         with open(headers_file) as fp:
             headers = [line.strip() for line in fp.readlines()]
 
-        with open(feature_ind_file) as fp:
-            feature_indices = [int(ind) for ind in fp.readlines()]
-
-        with open(output_ind_file) as fp:
-            output_indices = [int(ind) for ind in fp.readlines()]
-
-        with open(meta_ind_file) as fp:
-            meta_indices = [int(ind) for ind in fp.readlines()]
-
-        full_dataset = pd.read_csv(data_file, sep=" ", names=headers)
-        return full_dataset.iloc[:, feature_indices].to_numpy().reshape((-1, evals_per_config, len(feature_indices))), \
-               full_dataset.iloc[:, output_indices].to_numpy().reshape((-1, evals_per_config, len(output_indices))), \
-               full_dataset.iloc[:, meta_indices].to_numpy().reshape((-1, evals_per_config, len(meta_indices))), \
-               full_dataset.columns[feature_indices].to_numpy(), full_dataset.columns[output_indices].to_numpy(), \
-               full_dataset.columns[meta_indices].to_numpy()
+        feature_indices = _read_int_indices(feature_ind_file)
+        output_indices = _read_int_indices(output_ind_file)
+        meta_indices = _read_int_indices(meta_ind_file)
+        columns = np.array(headers, dtype=object)
+        names = columns[feature_indices], columns[output_indices], columns[meta_indices]
+
+        # The extracted arrays are stored as .npy files and memory-mapped, such that only the configurations that are
+        # actually gathered into a training or test set need to be resident in memory.
+        # Metadata is cached at the dtype it was parsed with, which does not depend on the requested dtype.
+        dtype = np.dtype(dtype)
+        cache_files = [data_folder / f"{full_benchmark_name}_X_{dtype.name}.npy",
+                       data_folder / f"{full_benchmark_name}_Y_{dtype.name}.npy",
+                       data_folder / f"{full_benchmark_name}_meta.npy"]
+        source_mtime = max(f.stat().st_mtime for f in (data_file, headers_file, feature_ind_file, output_ind_file,
+                                                      meta_ind_file))
+        if all(f.exists() and f.stat().st_mtime >= source_mtime for f in cache_files):
+            _log.debug("Memory-mapping cached arrays for %s" % full_benchmark_name)
+            arrays = [np.load(f, mmap_mode='r') for f in cache_files]
+        else:
+            full_dataset, feature_indices, output_indices, meta_indices = _read_benchmark_columns(
+                data_file, headers, feature_indices, output_indices, meta_indices)
+            # Features and outputs are converted straight to the requested dtype. All arrays are made row-major,
+            # which keeps gathering configurations along the first axis contiguous.
+            arrays = [np.ascontiguousarray(full_dataset.iloc[:, indices].to_numpy(dtype=dt))
+                      for indices, dt in zip((feature_indices, output_indices, meta_indices), (dtype, dtype, None))]
+            try:
+                for f, arr in zip(cache_files, arrays):
+                    _write_atomically(f, lambda fp: np.save(fp, arr))
+                arrays = [np.load(f, mmap_mode='r') for f in cache_files]
+            except OSError as e:
+                _log.debug("Could not cache arrays for %s: %s" % (full_benchmark_name, str(e)))
+
+        return tuple(arr.reshape((-1, evals_per_config, arr.shape[1])) for arr in arrays) + names
 
     def _iterate_dataset_configurations(self, train_frac: float = None, train_size: int = None,
-                                        rng: RNG_Input = None, return_indices: bool = False) -> \
-            Tuple[Dataset, Dataset, Optional[Tuple[np.ndarray, np.ndarray]]]:
+                                        rng: RNG_Input = None) -> Tuple[np.ndarray, np.ndarray]:
         """
         Given a dataset consisting of input features of shape [N, i, Dx], output targets of shape [N, i, Dy] and meta
         information of shape [N, i, Dz], where N is the number of configurations, i is the number of evaluations per
         configuration, and Dx, Dy and Dz are the dimensionality of the inputs, targets, and metadata respectively,
-        returns a generator that generates a training and a test dataset tuple by choosing distinct configurations.
+        returns a generator that generates the indices of a training and a test dataset by choosing distinct
+        configurations. The datasets themselves can be gathered from these indices on demand using a DatasetView.
+        Both sets of indices are sorted, i.e. the configurations retain their order from the full dataset.
         Each training dataset contains train_frac * N configurations and all i evaluations, whereas the test dataset
         contains all the evaluations of all remaining configurations. Thus, for a training set containing Nt
         configurations, the input and output arrays would have shapes [Nt, i, Dx] and [Nt, i, Dy] whereas for the
@@ -297,12 +627,10 @@ class HPOBenchData(BenchmarkData):
         :param rng: RandomState, int or None
             A seed for a random number generator or an instance of np.random.RandomState. If None, a random seed value
             is used.
-        :param return_indices: bool
-            If True, also returns the indices used to construct the training and test sets.
-        :return: training set, test set, (optional) train and test indices
+        :return: train indices, test indices
         """
 
-        X_full, y_full, meta_full = self.X_full, self.Y_full, self.meta_full
+        X_full = self.X_full
         if rng is None or isinstance(rng, int):
             rng = np.random.RandomState(rng)
 
@@ -312,25 +640,28 @@ class HPOBenchData(BenchmarkData):
         if train_frac is not None:
             train_size = floor(train_frac * X_full.shape[0])
 
-        while (True):
-            train_ind = rng.choice(range(X_full.shape[0]), size=train_size, replace=False)
-            test_ind = exclude_indices(X_full.shape[0], train_ind)
-            train_set = X_full[train_ind, :, :], y_full[train_ind, :, :], meta_full[train_ind, :, :]
-            test_set = X_full[test_ind, :, :], y_full[test_ind, :, :], meta_full[test_ind, :, :]
-
-            if return_indices:
-                yield train_set, test_set, (train_ind, test_ind)
-            else:
-                yield train_set, test_set
+        # The test set is the complement of the training set, tracked by a single mask that is re-used for every split
+        test_mask = np.ones(X_full.shape[0], dtype=bool)
 
-    @staticmethod
-    def _generate_evaluation_subsets(dataset: Dataset, rng: RNG_Input = None) -> Dataset:
+        while (True):
+            # Sorted indices turn gathering the subsets from the full dataset into (nearly) sequential reads
+            train_ind = np.sort(rng.permutation(X_full.shape[0])[:train_size])
+            test_mask.fill(True)
+            test_mask[train_ind] = False
+            test_ind = np.flatnonzero(test_mask)
+            yield train_ind, test_ind
+
+    def _generate_evaluation_subsets(self, dataset: Dataset, rng: RNG_Input = None) -> Dataset:
         """
         Given a dataset consisting of the input features, outputs and metadata of shapes [N, i, Dx], [N, i, Dy] and
         [N, i, Dz] respectively, generates subsets that randomly select one of i possible evaluations for each of the
         N configurations. Thus, the generator yields a tuple containing 3 arrays of shapes [N, Dx], [N, Dy] and [N, Dz]
         respectively.
 
+        The yielded arrays are buffers that are re-used for every subset generated by this object, i.e. they are
+        overwritten in-place by the next subset. Consequently, the training set of the previous call to update() is
+        invalidated by the next call.
+
         :param dataset:
         :param rng:
         :return:
@@ -349,22 +680,43 @@ class HPOBenchData(BenchmarkData):
         assert N == meta.shape[0] and i == meta.shape[1], "Shape mismatch between input features array of shape %s " \
                                                           "and  metadata array of shape %s." % \
                                                           (str(X.shape), str(meta.shape))
-        indices = list(range(i))
+        shapes = (N, Dx), (N, Dy), (N, Dz)
+        out = self._eval_buffers
+        if out is None or any(buf.shape != shape or buf.dtype != arr.dtype
+                              for buf, shape, arr in zip(out, shapes, (X, y, meta))):
+            out = tuple(np.empty(shape, dtype=arr.dtype) for shape, arr in zip(shapes, (X, y, meta)))
+            self._eval_buffers = out
+
+        if njit is not None and all(arr.dtype.kind in "biuf" for arr in (X, y, meta)):
+            # All three arrays are gathered in a single parallel pass over the configurations
+            while True:
+                choices = rng.randint(0, i, size=N)
+                _gather_evaluations(X, y, meta, choices, *out)
+                yield out
+
+        # Picking evaluation j of configuration n is a single row gather on the flattened [N * i, D] arrays
+        row_offsets = np.arange(N) * i
+        X, y, meta = X.reshape((N * i, Dx)), y.reshape((N * i, Dy)), meta.reshape((N * i, Dz))
 
         while True:
-            choices = rng.choice(indices, size=(X.shape[0], 1, 1), replace=True)
-            yield np.take_along_axis(X, choices, axis=1).reshape((N, Dx)), \
-                  np.take_along_axis(y, choices, axis=1).reshape((N, Dy)), \
-                  np.take_along_axis(meta, choices, axis=1).reshape((N, Dz))
+            rows = row_offsets + rng.randint(0, i, size=N)
+            # All rows are valid, so mode="clip" skips the bounds checks that would force np.take to buffer its output
+            for arr, buf in zip((X, y, meta), out):
+                np.take(arr, rows, axis=0, out=buf, mode="clip")
+            yield out
+
 
 def exclude_indices(npoints: int, indices: Sequence) -> Sequence:
     """ Helper function to generate a sequence of indices that excludes the given indices for a given maximum number of
-    indices. """
+    indices. If numba is available, the sorted complement is built in a single pass without an intermediate mask. """
 
-    all_idx = np.arange(npoints, dtype=int)
-    req_idx = np.repeat(True, repeats=npoints)
-    req_idx[indices] = False
-    return all_idx[req_idx]
+    indices = np.unique(np.asarray(indices, dtype=np.int64))
+    if indices.size and (indices[0] < 0 or indices[-1] >= npoints):
+        raise IndexError("Indices to be excluded must lie in the range [0, %d), got [%d, %d]." %
+                         (npoints, indices[0], indices[-1]))
+    if njit is not None:
+        return _sorted_complement(npoints, indices)
+    return np.setdiff1d(np.arange(npoints, dtype=np.int64), indices, assume_unique=True)
 
 
 class SyntheticData(BenchmarkData):
@@ -447,18 +799,13 @@ class SyntheticData(BenchmarkData):
         with open(headers_file) as fp:
             headers = [line.strip() for line in fp.readlines()]
 
-        with open(feature_ind_file) as fp:
-            feature_indices = [int(ind) for ind in fp.readlines()]
-
-        with open(output_ind_file) as fp:
-            output_indices = [int(ind) for ind in fp.readlines()]
-
-        with open(meta_ind_file) as fp:
-            meta_indices = [int(ind) for ind in fp.readlines()]
-
-        full_dataset = pd.read_csv(data_file, sep=" ", names=headers)
-        return full_dataset.iloc[:, feature_indices].to_numpy().reshape((-1, len(feature_indices))), \
-               full_dataset.iloc[:, output_indices].to_numpy().reshape((-1, len(output_indices))), \
-               full_dataset.iloc[:, meta_indices].to_numpy().reshape((-1, len(meta_indices))), \
-               full_dataset.columns[feature_indices].to_numpy(), full_dataset.columns[output_indices].to_numpy(), \
-               full_dataset.columns[meta_indices].to_numpy()
+        feature_indices = _read_int_indices(feature_ind_file)
+        output_indices = _read_int_indices(output_ind_file)
+        meta_indices = _read_int_indices(meta_ind_file)
+        full_dataset, feature_indices, output_indices, meta_indices = _read_benchmark_columns(
+            data_file, headers, feature_indices, output_indices, meta_indices)
+        arr, columns = full_dataset.to_numpy(), full_dataset.columns.to_numpy()
+        return arr.take(feature_indices, axis=1).reshape((-1, len(feature_indices))), \
+               arr.take(output_indices, axis=1).reshape((-1, len(output_indices))), \
+               arr.take(meta_indices, axis=1).reshape((-1, len(meta_indices))), \
+               columns[feature_indices], columns[output_indices], columns[meta_indices]
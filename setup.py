@@ -12,7 +12,7 @@ setup(
     packages=find_packages(),
     python_requires='>=3.8',
     install_requires=['torch', 'torchvision', 'numpy', 'emcee', 'scipy', 'tensorboard', 'pandas', 'seaborn',
-                      'matplotlib', 'ConfigSpace'],
+                      'matplotlib', 'ConfigSpace', 'joblib'],
     extras_require={},
     keywords=['python', 'Bayesian', 'neural networks', 'benchmarking', 'optimization'],
 )